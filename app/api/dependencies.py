@@ -1,6 +1,10 @@
-from fastapi import Header, HTTPException
+import hmac
+from typing import Any, Dict
 
-async def get_api_key(x_api_key: str = Header(..., alias="X-API-Key")):
+from fastapi import Header, HTTPException, Request
+from app.models.v1 import Provider
+
+async def get_api_key(request: Request, x_api_key: str = Header(..., alias="X-API-Key")):
     """
     Dependency to get and validate API key from headers
     """
@@ -9,4 +13,25 @@ async def get_api_key(x_api_key: str = Header(..., alias="X-API-Key")):
             status_code=401,
             detail="X-API-Key header is required"
         )
-    return x_api_key
\ No newline at end of file
+    candidate = x_api_key.encode()
+    if not any(hmac.compare_digest(candidate, key) for key in request.app.state.valid_api_keys):
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid API key"
+        )
+    return x_api_key
+
+async def get_providers(request: Request) -> Dict[str, Any]:
+    """
+    Dependency to get the provider clients shared by the whole application
+    """
+    return request.app.state.providers
+
+async def get_provider(
+    request: Request,
+    provider: Provider = Provider.opensubtitles
+) -> Any:
+    """
+    Dependency to get the shared client of the provider selected in the query
+    """
+    return request.app.state.providers[provider.value]
@@ -1,194 +1,246 @@
 # app/api/routes.py
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi_cache import FastAPICache
+from fastapi_cache.decorator import cache
+import asyncio
+import functools
 import logging
-from typing import Optional
-from app.models.v1 import DownloadRequestV1, DownloadResponseV1, SearchResponseV1
-from app.services.opensubtitles import OpenSubtitlesAPI
-from app.services.subdl import SubDLAPI
-from app.services.subsource import SubSourceAPI
-
-# Configuración del logger
-logging.basicConfig(level=logging.INFO)
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+from app.api.dependencies import get_api_key, get_provider, get_providers
+from app.config import get_settings
+from app.core.cache import ORJSONCoder
+from app.models.v1 import DownloadRequestV1, DownloadResponseV1, SearchProvider, SearchResponseV1
+
+# El logging se configura una sola vez en app/main.py
 logger = logging.getLogger(__name__)
 
+settings = get_settings()
+
 # Router para la API de subtítulos
-router = APIRouter()
+router = APIRouter(
+    dependencies=[Depends(get_api_key)] if settings.require_api_key else []
+)
+
+def handle_provider_errors(message: str):
+    """
+    Decorador que registra los errores inesperados de un endpoint y los
+    convierte en un HTTPException 500; los HTTPException se propagan tal cual
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            try:
+                return await func(*args, **kwargs)
+            except HTTPException:
+                raise
+            except Exception as e:
+                provider = kwargs.get("provider")
+                logger.exception(message, extra={"provider": getattr(provider, "value", provider)})
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"{message}: {str(e)}"
+                )
+        return wrapper
+    return decorator
+
+# Idiomas y formatos apenas cambian: se cachean un día por proveedor
+STATIC_CACHE_EXPIRE = 86400
+
+def _provider_key_builder(
+    func,
+    namespace: str = "",
+    *,
+    request: Optional[Request] = None,
+    response: Optional[Response] = None,
+    args=(),
+    kwargs=None
+) -> str:
+    """
+    Construye la clave de caché a partir del proveedor de la query
+    """
+    provider = request.query_params.get("provider", "opensubtitles") if request else "opensubtitles"
+    return f"{namespace}:{provider}"
+
+# Las búsquedas populares se repiten mucho: se cachean 15 minutos
+SEARCH_CACHE_EXPIRE = 900
+
+# Fallos consecutivos tras los que se invalida la caché de un proveedor
+PROVIDER_FAILURE_THRESHOLD = 3
+provider_failures: Dict[str, int] = {}
+
+def _search_key_builder(
+    func,
+    namespace: str = "",
+    *,
+    request: Optional[Request] = None,
+    response: Optional[Response] = None,
+    args=(),
+    kwargs=None
+) -> str:
+    """
+    Construye la clave de caché con todos los parámetros de la búsqueda
+    """
+    query = request.query_params if request else {}
+    provider = query.get("provider", "opensubtitles")
+    parts = (
+        query.get("imdb_id", ""),
+        query.get("type", "movie"),
+        query.get("languages", "en"),
+        query.get("season_number", ""),
+        query.get("episode_number", "")
+    )
+    return f"{namespace}:{provider}:" + ":".join(parts)
+
+async def _register_provider_failure(provider: str):
+    """
+    Lleva la cuenta de fallos de un proveedor e invalida su caché de búsquedas
+    cuando falla de forma repetida
+    """
+    provider_failures[provider] = provider_failures.get(provider, 0) + 1
+    if provider_failures[provider] >= PROVIDER_FAILURE_THRESHOLD:
+        provider_failures[provider] = 0
+        try:
+            await FastAPICache.clear(namespace=f"search:{provider}")
+        except Exception as e:
+            # Un fallo de la caché no debe ocultar el error original del proveedor
+            logger.warning("No se pudo invalidar la caché de %s: %s", provider, e)
+
+def _is_provider_failure(exc: Exception) -> bool:
+    """
+    Solo cuentan como fallo del proveedor los 5xx, timeouts y errores de red;
+    un 4xx (p. ej. título inexistente) es una respuesta normal
+    """
+    return not isinstance(exc, HTTPException) or exc.status_code >= 500
+
+# Llamada de búsqueda de cada proveedor según su interfaz
+SEARCH_DISPATCH = {
+    "opensubtitles": lambda client, **params: client.search_subtitles(params["imdb_id"]),
+    "subdl": lambda client, **params: client.search_subtitles(**params),
+    "subsource": lambda client, **params: client.search_subtitles(**params)
+}
+
+# Llamada de descarga de cada proveedor según su interfaz
+DOWNLOAD_DISPATCH = {
+    "opensubtitles": lambda client, request: client.download_subtitle(
+        file_id=request.file_id,
+        sub_format=request.sub_format
+    ),
+    "subdl": lambda client, request: client.download_subtitle(request.url),
+    "subsource": lambda client, request: client.download_subtitle(request.url)
+}
 
-# Mapa de proveedores de subtítulos
-subtitle_providers = {
-    "opensubtitles": OpenSubtitlesAPI,
-    "subdl": lambda: SubDLAPI("_fwrdNVkOW19Ni1xuYG_mfghv45o_Key"),
-    "subsource": lambda: SubSourceAPI()
+# Proveedor de cada host de descarga; las URLs relativas o de otros hosts son de SubDL
+DOWNLOAD_HOST_PROVIDER = {
+    "subsource.net": "subsource",
+    "www.subsource.net": "subsource",
+    "api.subsource.net": "subsource",
+    "subdl.com": "subdl",
+    "dl.subdl.com": "subdl"
 }
 
+async def _search_all_providers(providers: Dict[str, Any], **search_params) -> Dict[str, Any]:
+    """
+    Busca en todos los proveedores a la vez y devuelve el primer resultado no vacío
+    """
+    tasks = [
+        asyncio.create_task(SEARCH_DISPATCH[name](client, **search_params))
+        for name, client in providers.items()
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                response = await next_done
+            except Exception as e:
+                logger.warning("Proveedor descartado en la búsqueda conjunta: %s", e)
+                continue
+            if response.get('data'):
+                return response
+    finally:
+        # Cancelar las búsquedas que siguen en curso y recoger sus excepciones
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    return {"data": [], "total_count": 0, "total_pages": 1, "page": 1}
+
 @router.get("/api/v1/subtitles", response_model=SearchResponseV1)
+@cache(expire=SEARCH_CACHE_EXPIRE, namespace="search", key_builder=_search_key_builder, coder=ORJSONCoder)
+@handle_provider_errors("Error inesperado durante la búsqueda de subtítulos")
 async def search_subtitles(
     imdb_id: str,
-    provider: str = Query("opensubtitles", enum=["opensubtitles", "subdl", "subsource"]),
+    provider: SearchProvider = SearchProvider.opensubtitles,
     type: Optional[str] = Query("movie", enum=["movie", "tv"]),
     languages: Optional[str] = "en",
     season_number: Optional[int] = None,
-    episode_number: Optional[int] = None
+    episode_number: Optional[int] = None,
+    providers: Dict[str, Any] = Depends(get_providers)
 ):
     """
-    Busca subtítulos usando la API del proveedor especificado
+    Busca subtítulos usando la API del proveedor especificado, o en todos
+    ellos a la vez con provider=all
     """
+    search_params = {
+        "imdb_id": imdb_id,
+        "type": type,
+        "languages": languages,
+        "season_number": season_number,
+        "episode_number": episode_number
+    }
+
     try:
-        # Inicializar el cliente del proveedor seleccionado
-        client = subtitle_providers[provider]()
-
-        # Realizar la búsqueda según el proveedor
-        if provider == "opensubtitles":
-            response = await client.search_subtitles(imdb_id)
-        elif provider == "subsource":
-            response = await client.search_subtitles(
-                imdb_id=imdb_id,
-                type=type,
-                languages=languages,
-                season_number=season_number,
-                episode_number=episode_number
-            )
-        else:  # subdl
-            response = await client.search_subtitles(
-                imdb_id=imdb_id,
-                type=type,
-                languages=languages,
-                season_number=season_number,
-                episode_number=episode_number
-            )
-        
-        # Validar y limpiar los datos antes de crear el SearchResponseV1
-        data = response.get('data', [])
-        cleaned_data = []
-        
-        for item in data:
-            if isinstance(item, dict):
-                # Asegurar que existe la estructura básica
-                if 'attributes' not in item:
-                    item['attributes'] = {}
-                if 'id' not in item:
-                    item['id'] = str(item.get('attributes', {}).get('subtitle_id', ''))
-                if 'type' not in item:
-                    item['type'] = 'subtitle'
-                
-                # Limpiar y asegurar tipos de datos correctos
-                attrs = item['attributes']
-                if 'language' in attrs and attrs['language'] is None:
-                    attrs['language'] = ''
-                if 'subtitle_id' in attrs and attrs['subtitle_id'] is None:
-                    attrs['subtitle_id'] = ''
-                if 'files' in attrs and attrs['files'] is None:
-                    attrs['files'] = []
-                
-                # Asegurar que los archivos tienen la estructura correcta
-                if 'files' in attrs and isinstance(attrs['files'], list):
-                    cleaned_files = []
-                    for file in attrs['files']:
-                        if isinstance(file, dict):
-                            if 'file_name' not in file or file['file_name'] is None:
-                                file['file_name'] = ''
-                            if 'file_id' not in file or file['file_id'] is None:
-                                file['file_id'] = 0
-                            cleaned_files.append(file)
-                    attrs['files'] = cleaned_files
-
-                cleaned_data.append(item)
-
-        # Convertir la respuesta al modelo SearchResponseV1
-        return SearchResponseV1(
-            data=cleaned_data,
-            total_count=response.get('total_count', 0),
-            total_pages=response.get('total_pages', 1),
-            page=response.get('page', 1)
-        )
-
-    except HTTPException as he:
-        raise he
+        if provider is SearchProvider.all:
+            response = await _search_all_providers(providers, **search_params)
+        else:
+            # Cliente compartido del proveedor seleccionado
+            response = await SEARCH_DISPATCH[provider.value](providers[provider.value], **search_params)
     except Exception as e:
-        logger.error(f"Error inesperado durante la búsqueda de subtítulos: {str(e)}", exc_info=True)
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error inesperado durante la búsqueda de subtítulos: {str(e)}"
-        )
+        if _is_provider_failure(e):
+            await _register_provider_failure(provider.value)
+        raise
+
+    provider_failures.pop(provider.value, None)
+
+    # Convertir la respuesta al modelo SearchResponseV1
+    return SearchResponseV1.model_validate(response)
+
 @router.get("/api/v1/subtitles/languages")
-async def get_languages(
-    provider: str = Query("opensubtitles", enum=["opensubtitles", "subdl", "subsource"])
-):
+@cache(expire=STATIC_CACHE_EXPIRE, namespace="languages", key_builder=_provider_key_builder)
+@handle_provider_errors("Error obteniendo idiomas")
+async def get_languages(client: Any = Depends(get_provider)):
     """
     Obtiene la lista de idiomas soportados por el proveedor
     """
-    try:
-        client = subtitle_providers[provider]()
-        return await client.languages()
-    except Exception as e:
-        logger.error(f"Error obteniendo idiomas: {str(e)}", exc_info=True)
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error obteniendo idiomas: {str(e)}"
-        )
+    return await client.languages()
 
 @router.get("/api/v1/subtitles/formats")
-async def get_formats(
-    provider: str = Query("opensubtitles", enum=["opensubtitles", "subdl", "subsource"])
-):
+@cache(expire=STATIC_CACHE_EXPIRE, namespace="formats", key_builder=_provider_key_builder)
+@handle_provider_errors("Error obteniendo formatos")
+async def get_formats(client: Any = Depends(get_provider)):
     """
     Obtiene la lista de formatos soportados por el proveedor
     """
-    try:
-        client = subtitle_providers[provider]()
-        return await client.formats()
-    except Exception as e:
-        logger.error(f"Error obteniendo formatos: {str(e)}", exc_info=True)
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error obteniendo formatos: {str(e)}"
-        )
+    return await client.formats()
 
 @router.post("/api/v1/subtitles/download", response_model=DownloadResponseV1)
-async def download_subtitle(request: DownloadRequestV1):
+@handle_provider_errors("Error inesperado durante la descarga del subtítulo")
+async def download_subtitle(
+    request: DownloadRequestV1,
+    providers: Dict[str, Any] = Depends(get_providers)
+):
     """
     Descarga un subtítulo usando su file_id o URL según el proveedor
     """
-    try:
-        provider = None
-        # Determinar el proveedor basado en la estructura de la solicitud
-        if request.url:
-            if "subsource" in request.url:
-                provider = "subsource"
-            else:
-                provider = "subdl"
-        else:
-            provider = "opensubtitles"
-
-        client = subtitle_providers[provider]()
-
-        # Realizar la petición de descarga según el proveedor
-        if provider == "subsource":
-            response = await client.download_subtitle(request.url)
-        elif provider == "subdl":
-            response = await client.download_subtitle(request.url)
-        else:  # opensubtitles
-            response = await client.download_subtitle(
-                file_id=request.file_id,
-                sub_format=request.sub_format
-            )
-        
-        # Convertir la respuesta al modelo DownloadResponseV1
-        return DownloadResponseV1(
-            link=response.get('link', ''),
-            file_name=response.get('file_name', ''),
-            requests=response.get('requests', 0),
-            remaining=response.get('remaining', 0),
-            message=response.get('message', ''),
-            reset_time=response.get('reset_time', ''),
-            reset_time_utc=response.get('reset_time_utc', '')
-        )
-
-    except HTTPException as he:
-        raise he
-    except Exception as e:
-        logger.error(f"Error inesperado durante la descarga del subtítulo: {str(e)}", exc_info=True)
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error inesperado durante la descarga del subtítulo: {str(e)}"
-        )
\ No newline at end of file
+    # Determinar el proveedor basado en la estructura de la solicitud
+    if request.url:
+        # hostname descarta puerto y credenciales y viene en minúsculas
+        host = urlsplit(request.url).hostname or ""
+        provider = DOWNLOAD_HOST_PROVIDER.get(host, "subdl")
+    else:
+        provider = "opensubtitles"
+
+    # Realizar la petición de descarga según el proveedor
+    response = await DOWNLOAD_DISPATCH[provider](providers[provider], request)
+
+    # Convertir la respuesta al modelo DownloadResponseV1
+    return DownloadResponseV1.model_validate(response)
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from functools import lru_cache
+from typing import List, Optional
 
 class Settings(BaseSettings):
     app_name: str = "Subtitles API"
@@ -7,11 +7,22 @@ class Settings(BaseSettings):
     debug: bool = False
     opensubtitles_api_key: str
     opensubtitles_base_url: str = "https://api.opensubtitles.com/api/v1"
+    subdl_api_key: str
     addic7ed_base_url: str = "https://www.addic7ed.com"
+    redis_url: Optional[str] = None  # Sin Redis se usa caché en memoria
+    require_api_key: bool = False  # Exigir la cabecera X-API-Key en la API
+    api_keys: List[str] = []  # Claves aceptadas en X-API-Key
+    cors_origins: List[str] = [
+        "http://localhost:5173",
+        "https://chillflix.win"
+    ]
 
     class Config:
         env_file = ".env"
+        case_sensitive = False
+
+# Se instancia una sola vez al importar el módulo
+settings = Settings()
 
-@lru_cache()
 def get_settings():
-    return Settings()
\ No newline at end of file
+    return settings
\ No newline at end of file
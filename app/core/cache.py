@@ -0,0 +1,19 @@
+# app/core/cache.py
+from typing import Any
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi_cache.coder import Coder
+
+class ORJSONCoder(Coder):
+    """
+    Codificador de caché que guarda las respuestas ya serializadas con orjson
+    """
+
+    @classmethod
+    def encode(cls, value: Any) -> bytes:
+        return orjson.dumps(value, default=jsonable_encoder)
+
+    @classmethod
+    def decode(cls, value: bytes) -> Any:
+        return orjson.loads(value)
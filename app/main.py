@@ -1,12 +1,48 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from fastapi_cache.backends.redis import RedisBackend
+from redis import asyncio as aioredis
 from app.api.routes import router
 from app.config import get_settings
+from app.services.opensubtitles import OpenSubtitlesAPI
+from app.services.subdl import SubDLAPI
+from app.services.subsource import SubSourceAPI
+import asyncio
 import logging
+import logging.config
+import logging.handlers
+import queue
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que encola el registro sin formatear, de modo que el mensaje
+    y el traceback se formatean en el hilo del QueueListener
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+# Setup logging: los registros se encolan y un hilo aparte los formatea y
+# escribe, de modo que la E/S de logs nunca bloquea el event loop
+log_queue: queue.Queue = queue.Queue(-1)
+logging.config.dictConfig({
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "queue": {
+            "()": LazyQueueHandler,
+            "queue": log_queue
+        }
+    },
+    "root": {"level": "INFO", "handlers": ["queue"]}
+})
+log_handler = logging.StreamHandler()
+log_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+log_listener = logging.handlers.QueueListener(log_queue, log_handler, respect_handler_level=True)
+log_listener.start()
 logger = logging.getLogger(__name__)
 
 settings = get_settings()
@@ -14,19 +50,14 @@ settings = get_settings()
 app = FastAPI(
     title=settings.app_name,
     version=settings.app_version,
-    debug=settings.debug
+    debug=settings.debug,
+    default_response_class=ORJSONResponse
 )
 
-# Configuración de CORS
-origins = [
-    "http://localhost:5173",
-    "https://chillflix.win"
-]
-
-# Agregar middleware de CORS
+# Agregar middleware de CORS con los orígenes de la configuración
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=origins,
+    allow_origins=settings.cors_origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -35,17 +66,51 @@ app.add_middleware(
 # Include routers
 app.include_router(router)
 
+@app.on_event("startup")
+async def startup_event():
+    # Caché de respuestas: Redis si está configurado, memoria en caso contrario
+    if settings.redis_url:
+        backend = RedisBackend(aioredis.from_url(settings.redis_url))
+    else:
+        backend = InMemoryBackend()
+    FastAPICache.init(backend, prefix="subs")
+
+    # Claves de API válidas, cargadas una sola vez
+    app.state.valid_api_keys = frozenset(key.encode() for key in settings.api_keys)
+
+    # Una única instancia por proveedor para reutilizar sus conexiones HTTP
+    app.state.providers = {
+        "opensubtitles": OpenSubtitlesAPI(settings.opensubtitles_base_url),
+        "subdl": SubDLAPI(settings.subdl_api_key),
+        "subsource": SubSourceAPI()
+    }
+
+    # Precalentar las conexiones con una petición ligera por proveedor
+    results = await asyncio.gather(
+        *(client.languages() for client in app.state.providers.values()),
+        return_exceptions=True
+    )
+    for name, result in zip(app.state.providers, results):
+        if isinstance(result, Exception):
+            logger.warning("No se pudo precalentar el proveedor %s: %s", name, result)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for client in app.state.providers.values():
+        await client.close()
+    log_listener.stop()
+
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={"error": exc.detail, "status_code": exc.status_code}
     )
 
 @app.exception_handler(Exception)
 async def general_exception_handler(request, exc):
-    logger.error(f"Unhandled exception: {str(exc)}", exc_info=True)
-    return JSONResponse(
+    logger.exception("Unhandled exception: %s", exc, exc_info=exc)
+    return ORJSONResponse(
         status_code=500,
         content={"error": str(exc), "status_code": 500}
     )
\ No newline at end of file
@@ -1,5 +1,17 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from enum import Enum
+from pydantic import BaseModel, Field, model_validator
+from typing import Any, List, Optional
+
+class Provider(str, Enum):
+    opensubtitles = "opensubtitles"
+    subdl = "subdl"
+    subsource = "subsource"
+
+class SearchProvider(str, Enum):
+    opensubtitles = "opensubtitles"
+    subdl = "subdl"
+    subsource = "subsource"
+    all = "all"  # Búsqueda conjunta en todos los proveedores
 
 class UploaderInfo(BaseModel):
     uploader_id: Optional[int] = None  # Hacemos el campo opcional
@@ -20,6 +32,18 @@ class SubtitleFile(BaseModel):
     cd_number: Optional[int] = 1
     file_name: str
 
+    @model_validator(mode="before")
+    @classmethod
+    def _normalise(cls, values: Any) -> Any:
+        # Los proveedores pueden devolver nombre o id de archivo vacíos
+        if isinstance(values, dict):
+            values = dict(values)
+            if values.get('file_name') is None:
+                values['file_name'] = ''
+            if values.get('file_id') is None:
+                values['file_id'] = 0
+        return values
+
 class SubtitleAttributes(BaseModel):
     subtitle_id: str
     language: str
@@ -48,6 +72,22 @@ class SubtitleAttributes(BaseModel):
     class Config:
         extra = "allow"
 
+    @model_validator(mode="before")
+    @classmethod
+    def _normalise(cls, values: Any) -> Any:
+        # Sustituir nulos por valores vacíos y descartar archivos mal formados
+        if isinstance(values, dict):
+            values = dict(values)
+            if 'language' in values and values['language'] is None:
+                values['language'] = ''
+            if 'subtitle_id' in values and values['subtitle_id'] is None:
+                values['subtitle_id'] = ''
+            if 'files' in values and values['files'] is None:
+                values['files'] = []
+            if isinstance(values.get('files'), list):
+                values['files'] = [file for file in values['files'] if isinstance(file, dict)]
+        return values
+
 class SubtitleAPIV1(BaseModel):
     id: str
     type: str
@@ -56,11 +96,34 @@ class SubtitleAPIV1(BaseModel):
     class Config:
         extra = "allow"
 
+    @model_validator(mode="before")
+    @classmethod
+    def _normalise(cls, values: Any) -> Any:
+        # Asegurar que existe la estructura básica del resultado
+        if isinstance(values, dict):
+            values = dict(values)
+            if 'attributes' not in values:
+                values['attributes'] = {}
+            if 'id' not in values and isinstance(values['attributes'], dict):
+                values['id'] = str(values['attributes'].get('subtitle_id', ''))
+            if 'type' not in values:
+                values['type'] = 'subtitle'
+        return values
+
 class SearchResponseV1(BaseModel):
-    data: List[SubtitleAPIV1]
-    total_pages: int
-    total_count: int
-    page: int
+    data: List[SubtitleAPIV1] = []
+    total_pages: int = 1
+    total_count: int = 0
+    page: int = 1
+
+    @model_validator(mode="before")
+    @classmethod
+    def _normalise(cls, values: Any) -> Any:
+        # Descartar las entradas de data que no son un resultado
+        if isinstance(values, dict) and isinstance(values.get('data'), list):
+            values = dict(values)
+            values['data'] = [item for item in values['data'] if isinstance(item, dict)]
+        return values
 
 class DownloadRequestV1(BaseModel):
     file_id: Optional[int] = None
@@ -69,13 +132,13 @@ class DownloadRequestV1(BaseModel):
     full_link: Optional[str] = None  # Necesario para SubSource
 
 class DownloadResponseV1(BaseModel):
-    link: str
-    file_name: str
-    requests: int
-    remaining: int
-    message: str
-    reset_time: str
-    reset_time_utc: str
+    link: str = ""
+    file_name: str = ""
+    requests: int = 0
+    remaining: int = 0
+    message: str = ""
+    reset_time: str = ""
+    reset_time_utc: str = ""
 
 class SearchParams(BaseModel):
     query: Optional[str] = None
@@ -88,8 +151,4 @@ class SearchParams(BaseModel):
     episode_number: Optional[int] = None
     parent_imdb_id: Optional[str] = None
     parent_tmdb_id: Optional[int] = None
-    page: Optional[int] = 1
-    
-    def dict(self, *args, **kwargs):
-        d = super().dict(*args, **kwargs)
-        return {k: v for k, v in d.items() if v is not None}
\ No newline at end of file
+    page: Optional[int] = 1
\ No newline at end of file
@@ -1,15 +1,14 @@
+import asyncio
 import logging
 from typing import Optional, Dict, Any
 import aiohttp
-from app.models.v1 import SearchParams
+import orjson
 from fastapi import HTTPException
-from pydantic import BaseModel
 
-# Configuración del logger
-logging.basicConfig(level=logging.INFO)
+# El logging se configura una sola vez en app/main.py
 logger = logging.getLogger(__name__)
 # app/services/opensubtitles.py
-from app.core.config import settings
+from app.config import settings
 
 class OpenSubtitlesAPI:
     """
@@ -22,12 +21,42 @@ class OpenSubtitlesAPI:
         Args:
             base_url: URL base de la API (por defecto: https://api.opensubtitles.com/api/v1)
         """
-        self.api_key = settings.OPENSUBTITLES_API_KEY
+        self.api_key = settings.opensubtitles_api_key
         self.base_url = base_url
         self.headers = {
             "Api-Key": self.api_key,
             "Content-Type": "application/json"
         }
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Devuelve la sesión HTTP compartida, creándola en el primer uso
+
+        Returns:
+            Sesión de aiohttp reutilizada entre peticiones
+        """
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                headers=self.headers,
+                connector=aiohttp.TCPConnector(limit=100, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=10, connect=3)
+            )
+        return self._session
+
+    async def close(self):
+        """
+        Cierra la sesión HTTP compartida
+        """
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def __aenter__(self) -> "OpenSubtitlesAPI":
+        await self._get_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
 
     async def _make_request(
         self,
@@ -51,34 +80,41 @@ class OpenSubtitlesAPI:
         url = f"{self.base_url}/{endpoint}"
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.request(
-                    method=method,
-                    url=url,
-                    params=params,
-                    json=data,
-                    headers=self.headers,
-                    ssl=False  # Solo para desarrollo
-                ) as response:
-                    response_text = await response.text()
+            session = await self._get_session()
+            async with session.request(
+                method=method,
+                url=url,
+                params=params,
+                data=orjson.dumps(data) if data is not None else None
+            ) as response:
+                body = await response.read()
+                
+                if response.status != 200:
+                    response_text = body.decode("utf-8", errors="replace")
+                    logger.error("Error en API OpenSubtitles: %s", response_text)
+                    raise HTTPException(
+                        status_code=response.status,
+                        detail=f"Error en API OpenSubtitles: {response_text}"
+                    )
                     
-                    if response.status != 200:
-                        logger.error(f"Error en API OpenSubtitles: {response_text}")
-                        raise HTTPException(
-                            status_code=response.status,
-                            detail=f"Error en API OpenSubtitles: {response_text}"
-                        )
-                        
-                    return await response.json()
+                return orjson.loads(body)
 
+        except HTTPException:
+            raise
+        except asyncio.TimeoutError:
+            logger.error("Tiempo de espera agotado con OpenSubtitles")
+            raise HTTPException(
+                status_code=504,
+                detail="Tiempo de espera agotado con OpenSubtitles"
+            )
         except aiohttp.ClientError as e:
-            logger.error(f"Error de conexión con OpenSubtitles: {str(e)}")
+            logger.error("Error de conexión con OpenSubtitles: %s", e)
             raise HTTPException(
                 status_code=503,
                 detail=f"Error de conexión con OpenSubtitles: {str(e)}"
             )
         except Exception as e:
-            logger.error(f"Error inesperado: {str(e)}")
+            logger.error("Error inesperado: %s", e)
             raise HTTPException(
                 status_code=500,
                 detail=f"Error inesperado: {str(e)}"
@@ -117,7 +153,7 @@ class OpenSubtitlesAPI:
             "imdb_id": imdb_id
         }
         
-        logger.info(f"Búsqueda por IMDB ID: {imdb_id}")
+        logger.info("Búsqueda por IMDB ID: %s", imdb_id)
         
         return await self._make_request(
             method="GET",
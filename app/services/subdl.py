@@ -1,101 +1,195 @@
 import aiohttp
+import asyncio
 import logging
-from typing import Optional, Dict, Any
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Mapping, Tuple
+import orjson
 from fastapi import HTTPException
 
 logger = logging.getLogger(__name__)
 
+# Atributos que son iguales en todos los resultados de SubDL
+_SUBDL_BASE_ATTRS = {
+    "download_count": 0,
+    "new_download_count": 0,
+    "hd": False,
+    "fps": 0.0,
+    "votes": 0,
+    "points": 0,
+    "ratings": 0.0,
+    "from_trusted": False,
+    "foreign_parts_only": False,
+    "ai_translated": False,
+    "machine_translated": False,
+    "comments": "",
+    "legacy_subtitle_id": None,
+    "upload_date": None,
+    "provider": "subdl"
+}
+
+# Respuesta compartida para búsquedas sin resultados; no debe modificarse
+_EMPTY_RESULT = {"data": [], "total_count": 0, "total_pages": 1, "page": 1}
+
+def _normalize_imdb(imdb_id: str) -> str:
+    """Añade el prefijo 'tt' al ID de IMDB si no lo tiene"""
+    return imdb_id if imdb_id[:2] == "tt" else "tt" + imdb_id
+
 class SubDLAPI:
     BASE_URL = "https://api.subdl.com/api/v1"
     DL_BASE_URL = "https://dl.subdl.com"
+    HEADERS = {
+        "Content-Type": "application/x-www-form-urlencoded",
+        "Accept": "application/json"
+    }
+    API_KEY_CHECK_TTL = 300  # Segundos durante los que se reutiliza verify_api_key
+    SEARCH_CACHE_SIZE = 1024  # Búsquedas con ETag que se conservan en memoria
+    # Segundos durante los que se revalida una búsqueda con If-None-Match; debe superar
+    # la caché de la ruta (SEARCH_CACHE_EXPIRE) para que la revalidación llegue a usarse
+    SEARCH_CACHE_TTL = 3600
     
     def __init__(self, api_key: str):
         self.api_key = api_key
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._languages: Optional[Dict] = None
+        self._formats: Optional[Dict] = None
+        self._api_key_valid: Optional[bool] = None
+        self._api_key_checked_at = 0.0
+        self._search_cache: "OrderedDict[Tuple, Tuple[str, Dict, float]]" = OrderedDict()
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Devuelve la sesión HTTP compartida, creándola en el primer uso"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                headers=self.HEADERS,
+                connector=aiohttp.TCPConnector(
+                    limit=200,
+                    limit_per_host=50,
+                    use_dns_cache=True,
+                    ttl_dns_cache=600,
+                    keepalive_timeout=75,
+                    enable_cleanup_closed=True,
+                    resolver=aiohttp.AsyncResolver()
+                ),
+                timeout=aiohttp.ClientTimeout(total=10, connect=3)
+            )
+        return self._session
+    
+    async def close(self):
+        """Cierra la sesión HTTP compartida"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+    
+    async def __aenter__(self) -> "SubDLAPI":
+        await self._get_session()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
     
     async def verify_api_key(self):
-        """Verifica que la API key sea válida"""
-        try:
-            await self._make_request("GET", "verify")
-            return True
-        except HTTPException:
-            return False
+        """Verifica que la API key sea válida; el resultado se reutiliza unos minutos"""
+        now = time.monotonic()
+        if self._api_key_valid is not None and now - self._api_key_checked_at < self.API_KEY_CHECK_TTL:
+            return self._api_key_valid
+        ok, data, _ = await self._make_request_raw("GET", "verify", raise_on_error=False)
+        # Solo se guarda una respuesta de la API con status; un timeout, un error de red
+        # o un 5xx sin JSON no dicen nada de la key
+        if data and "status" in data:
+            self._api_key_valid = ok
+            self._api_key_checked_at = now
+        return ok
         
     async def _make_request(self, method: str, endpoint: str, params: Optional[Dict] = None) -> Dict[Any, Any]:
-        async with aiohttp.ClientSession() as session:
-            url = f"{self.BASE_URL}/{endpoint}"
-            headers = {
-                "Content-Type": "application/x-www-form-urlencoded",
-                "Accept": "application/json"
-            }
-            params = params or {}
-            params["api_key"] = self.api_key
-            
-            try:
-                async with session.request(method, url, params=params, headers=headers) as response:
-                    try:
-                        data = await response.json()
-                    except aiohttp.ContentTypeError:
-                        logger.error("Error decoding JSON response from SubDL")
-                        raise HTTPException(status_code=500, detail="Invalid response from SubDL API")
-                    
-                    # La respuesta exitosa de SubDL siempre incluye status=true
-                    if not data.get("status", False):
-                        logger.error(f"SubDL API error: {data}")
-                        raise HTTPException(
-                            status_code=response.status,
-                            detail=data.get("message", "Unknown error from SubDL")
-                        )
-                    
-                    return data
-                    
-            except aiohttp.ClientError as e:
-                logger.error(f"Network error with SubDL API: {str(e)}")
-                raise HTTPException(status_code=500, detail="Network error connecting to SubDL API")
+        _, data, _ = await self._make_request_raw(method, endpoint, params)
+        if data is None:
+            # Solo search_subtitles envía If-None-Match y gestiona el 304
+            raise HTTPException(status_code=502, detail="Unexpected 304 response from SubDL API")
+        return data
+
+    async def _make_request_raw(self, method: str, endpoint: str, params: Optional[Dict] = None,
+                                raise_on_error: bool = True,
+                                headers: Optional[Dict] = None
+                                ) -> Tuple[bool, Optional[Dict[Any, Any]], Mapping[str, str]]:
+        """
+        Realiza la petición y devuelve (ok, data, cabeceras de la respuesta).
+        Con raise_on_error=False los errores se devuelven como (False, data, {}) sin crear un HTTPException.
+        Un 304 Not Modified se devuelve como (True, None, cabeceras).
+        """
+        session = await self._get_session()
+        url = f"{self.BASE_URL}/{endpoint}"
+        params = params or {}
+        params["api_key"] = self.api_key
+        
+        try:
+            async with session.request(method, url, params=params, headers=headers) as response:
+                if response.status == 304:
+                    return True, None, response.headers
+                
+                try:
+                    data = orjson.loads(await response.read())
+                except orjson.JSONDecodeError:
+                    logger.error("Error decoding JSON response from SubDL")
+                    if not raise_on_error:
+                        return False, {}, {}
+                    raise HTTPException(status_code=500, detail="Invalid response from SubDL API")
+                
+                # La respuesta exitosa de SubDL siempre incluye status=true
+                if not data.get("status", False):
+                    logger.error("SubDL API error: %s", data)
+                    if not raise_on_error:
+                        return False, data, {}
+                    raise HTTPException(
+                        status_code=response.status,
+                        detail=data.get("message", "Unknown error from SubDL")
+                    )
+                
+                return True, data, response.headers
+                
+        except asyncio.TimeoutError:
+            logger.error("Timeout connecting to SubDL API")
+            if not raise_on_error:
+                return False, {}, {}
+            raise HTTPException(status_code=504, detail="Timeout connecting to SubDL API")
+        except aiohttp.ClientError as e:
+            logger.error("Network error with SubDL API: %s", e)
+            if not raise_on_error:
+                return False, {}, {}
+            raise HTTPException(status_code=500, detail="Network error connecting to SubDL API")
 
     def _convert_to_opensubtitles_format(self, subdl_subtitle: Dict) -> Dict:
         """Convierte el formato de SubDL al formato de OpenSubtitles"""
+        g = subdl_subtitle.get
+        sd_id = g("sd_id", "")
+        release_name = g("release_name", "")
         return {
-            "id": str(subdl_subtitle.get("sd_id", "")),
+            "id": str(sd_id),
             "type": "subtitle",
             "attributes": {
-                "subtitle_id": str(subdl_subtitle.get("sd_id", "")),
-                "language": subdl_subtitle.get("language", "").lower(),
-                "download_count": 0,
-                "new_download_count": 0,
-                "hearing_impaired": subdl_subtitle.get("hi", False),
-                "hd": False,
-                "fps": 0.0,
-                "votes": 0,
-                "points": 0,
-                "ratings": 0.0,
-                "from_trusted": False,
-                "foreign_parts_only": False,
-                "ai_translated": False,
-                "machine_translated": False,
-                "release": subdl_subtitle.get("release_name", ""),
-                "comments": "",
-                "legacy_subtitle_id": None,
-                "url": subdl_subtitle.get("url", ""),
-                "upload_date": None,
-                "provider": "subdl",
+                **_SUBDL_BASE_ATTRS,
+                "subtitle_id": str(sd_id),
+                "language": g("language", "").lower(),
+                "hearing_impaired": g("hi", False),
+                "release": release_name,
+                "url": g("url", ""),
                 "uploader": {
                     "uploader_id": None,
-                    "name": subdl_subtitle.get("author", "Anonymous"),
+                    "name": g("author", "Anonymous"),
                     "rank": "anonymous"
                 },
                 "feature_details": {
-                    "feature_id": subdl_subtitle.get("sd_id", 0),
-                    "feature_type": "movie" if not subdl_subtitle.get("season") else "tv",
+                    "feature_id": g("sd_id", 0),
+                    "feature_type": "movie" if not g("season") else "tv",
                     "year": None,
-                    "title": subdl_subtitle.get("release_name", ""),
-                    "movie_name": subdl_subtitle.get("release_name", ""),
+                    "title": release_name,
+                    "movie_name": release_name,
                     "imdb_id": None,
                     "tmdb_id": None
                 },
                 "files": [{
                     "file_id": 0,
                     "cd_number": 1,
-                    "file_name": subdl_subtitle.get("name", "")
+                    "file_name": g("name", "")
                 }]
             }
         }
@@ -115,40 +209,62 @@ class SubDLAPI:
         params = {
             "type": type,
             "languages": languages,
-            "subs_per_page": 30
+            "subs_per_page": 30,
+            "imdb_id": _normalize_imdb(imdb_id)
         }
 
-        # Para películas
-        if type == "movie":
-            params["imdb_id"] = f"tt{imdb_id}" if not imdb_id.startswith('tt') else imdb_id
         # Para series
-        else:
-            if not imdb_id.startswith('tt'):
-                imdb_id = f"tt{imdb_id}"
-            params["imdb_id"] = imdb_id
+        if type != "movie":
             if season_number:
                 params["season"] = season_number
             if episode_number:
                 params["episode"] = episode_number
 
-        try:
-            data = await self._make_request("GET", "subtitles", params)
-            
-            # Convertir resultados al formato de OpenSubtitles
-            converted_subtitles = [
-                self._convert_to_opensubtitles_format(sub) 
-                for sub in data.get("subtitles", [])
-            ]
-            
-            return {
-                "data": converted_subtitles,
-                "total_count": len(converted_subtitles),
-                "total_pages": data.get("totalPages", 1),
-                "page": data.get("currentPage", 1)
-            }
-        except Exception as e:
-            logger.error(f"Error searching subtitles: {str(e)}")
-            raise
+        cache_key = (params["imdb_id"], type, languages, season_number, episode_number)
+        now = time.monotonic()
+        cached = self._search_cache.get(cache_key)
+        if cached is not None and cached[2] <= now:
+            del self._search_cache[cache_key]
+            cached = None
+        
+        request_headers = {"If-None-Match": cached[0]} if cached is not None else None
+        _, data, response_headers = await self._make_request_raw(
+            "GET", "subtitles", params, headers=request_headers
+        )
+        
+        # 304: el resultado guardado sigue vigente
+        if data is None and cached is not None:
+            # Otra búsqueda pudo expulsar la entrada durante la petición: se vuelve a guardar
+            self._search_cache[cache_key] = cached
+            self._search_cache.move_to_end(cache_key)
+            if len(self._search_cache) > self.SEARCH_CACHE_SIZE:
+                self._search_cache.popitem(last=False)
+            return cached[1]
+        if not data or not data.get("subtitles"):
+            self._search_cache.pop(cache_key, None)
+            return _EMPTY_RESULT
+        
+        # Convertir resultados al formato de OpenSubtitles
+        convert = self._convert_to_opensubtitles_format
+        converted_subtitles = list(map(convert, data["subtitles"]))
+        
+        result = {
+            "data": converted_subtitles,
+            "total_count": len(converted_subtitles),
+            "total_pages": data.get("totalPages", 1),
+            "page": data.get("currentPage", 1)
+        }
+
+        etag = response_headers.get("ETag")
+        if etag:
+            self._search_cache[cache_key] = (etag, result, now + self.SEARCH_CACHE_TTL)
+            self._search_cache.move_to_end(cache_key)
+            if len(self._search_cache) > self.SEARCH_CACHE_SIZE:
+                self._search_cache.popitem(last=False)
+        else:
+            # Sin ETag el resultado guardado ya no es el vigente
+            self._search_cache.pop(cache_key, None)
+        return result
 
     async def download_subtitle(self, url: str) -> Dict:
         """
@@ -172,9 +288,13 @@ class SubDLAPI:
         }
         
     async def languages(self) -> Dict:
-        """Obtiene la lista de idiomas soportados"""
-        return await self._make_request("GET", "languages")
+        """Obtiene la lista de idiomas soportados; se pide una sola vez"""
+        if self._languages is None:
+            self._languages = await self._make_request("GET", "languages")
+        return self._languages
         
     async def formats(self) -> Dict:
-        """Obtiene la lista de formatos soportados"""
-        return await self._make_request("GET", "formats")
\ No newline at end of file
+        """Obtiene la lista de formatos soportados; se pide una sola vez"""
+        if self._formats is None:
+            self._formats = await self._make_request("GET", "formats")
+        return self._formats
\ No newline at end of file
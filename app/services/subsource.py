@@ -1,51 +1,95 @@
 # app/services/subsource.py
 import aiohttp
+import asyncio
 import logging
+from functools import lru_cache
 from typing import Optional, Dict, Any
+from urllib.parse import urlsplit
+import orjson
 from fastapi import HTTPException
 
 logger = logging.getLogger(__name__)
 
+# Respuesta compartida para búsquedas sin resultados; no debe modificarse
+_EMPTY_RESULT = {"data": [], "total_count": 0, "total_pages": 1, "page": 1}
+
 class SubSourceAPI:
     API_URL = "https://api.subsource.net/api"
+    HEADERS = {
+        "Content-Type": "application/json",
+        "Accept": "application/json"
+    }
+    LANGUAGE_MAP = {
+        "Big 5 code": "zh",
+        "Brazilian Portuguese": "pt-BR",
+        "Bulgarian": "bg",
+        "Chinese BG code": "zh",
+        "Farsi/Persian": "fa",
+        "Chinese(Simplified)": "zh-Hans",
+        "Chinese(Traditional)": "zh-Hant",
+        "French(France)": "fr-FR",
+        "Icelandic": "is",
+        "Spanish(Latin America)": "es-419",
+        "Spanish(Spain)": "es-ES"
+    }
+    ENDPOINTS = {
+        "search": f"{API_URL}/searchMovie",
+        "get_movie": f"{API_URL}/getMovie",
+        "get_sub": f"{API_URL}/getSub",
+        "download": f"{API_URL}/downloadSub"
+    }
+    # Idiomas y formatos son fijos, no requieren petición
+    LANGUAGES = {"languages": list(LANGUAGE_MAP.values())}
+    FORMATS = {"formats": ["srt"]}  # SubSource típicamente usa SRT
     
     def __init__(self):
-        self.endpoints = {
-            "search": f"{self.API_URL}/searchMovie",
-            "get_movie": f"{self.API_URL}/getMovie",
-            "get_sub": f"{self.API_URL}/getSub",
-            "download": f"{self.API_URL}/downloadSub"
-        }
-        
-        self.language_map = {
-            "Big 5 code": "zh",
-            "Brazilian Portuguese": "pt-BR",
-            "Bulgarian": "bg",
-            "Chinese BG code": "zh",
-            "Farsi/Persian": "fa",
-            "Chinese(Simplified)": "zh-Hans",
-            "Chinese(Traditional)": "zh-Hant",
-            "French(France)": "fr-FR",
-            "Icelandic": "is",
-            "Spanish(Latin America)": "es-419",
-            "Spanish(Spain)": "es-ES"
-        }
+        self._session: Optional[aiohttp.ClientSession] = None
 
-    async def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None, stream: bool = False) -> Dict[Any, Any]:
-        async with aiohttp.ClientSession() as session:
-            headers = {
-                "Content-Type": "application/json",
-                "Accept": "application/json"
-            }
-            
-            try:
-                async with session.request(method, endpoint, json=data, headers=headers) as response:
-                    if stream:
-                        return await response.read()
-                    return await response.json()
-            except aiohttp.ClientError as e:
-                logger.error(f"Error en la petición a SubSource: {str(e)}")
-                raise HTTPException(status_code=500, detail=str(e))
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Devuelve la sesión HTTP compartida, creándola en el primer uso"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                headers=self.HEADERS,
+                connector=aiohttp.TCPConnector(
+                    limit=200,
+                    limit_per_host=50,
+                    use_dns_cache=True,
+                    ttl_dns_cache=600,
+                    keepalive_timeout=75,
+                    enable_cleanup_closed=True,
+                    resolver=aiohttp.AsyncResolver()
+                ),
+                timeout=aiohttp.ClientTimeout(total=10, connect=3)
+            )
+        return self._session
+
+    async def close(self):
+        """Cierra la sesión HTTP compartida"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def __aenter__(self) -> "SubSourceAPI":
+        await self._get_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None) -> Dict[Any, Any]:
+        session = await self._get_session()
+        
+        try:
+            async with session.request(method, endpoint, json=data) as response:
+                return orjson.loads(await response.read())
+        except orjson.JSONDecodeError:
+            logger.error("Respuesta JSON inválida de SubSource")
+            raise HTTPException(status_code=500, detail="Respuesta inválida de SubSource")
+        except asyncio.TimeoutError:
+            logger.error("Tiempo de espera agotado con SubSource")
+            raise HTTPException(status_code=504, detail="Tiempo de espera agotado con SubSource")
+        except aiohttp.ClientError as e:
+            logger.error("Error en la petición a SubSource: %s", e)
+            raise HTTPException(status_code=500, detail=str(e))
 
     def _convert_to_opensubtitles_format(self, subsource_subtitle: Dict) -> Dict:
         """Convierte el formato de SubSource al formato de OpenSubtitles"""
@@ -69,9 +113,11 @@ class SubSourceAPI:
             }
         }
 
-    def _map_language(self, lang: str) -> str:
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _map_language(lang: str) -> str:
         """Mapea los códigos de idioma de SubSource a códigos estándar"""
-        return self.language_map.get(lang, lang.lower())
+        return SubSourceAPI.LANGUAGE_MAP.get(lang, lang.lower())
 
     async def search_subtitles(self, imdb_id: str, type: str = "movie", languages: str = "en", 
                              season_number: Optional[int] = None, episode_number: Optional[int] = None) -> Dict:
@@ -85,10 +131,10 @@ class SubSourceAPI:
         search_data = {
             "query": f"{imdb_id}"  # Podrías agregar más información si es necesario
         }
-        search_results = await self._make_request("POST", self.endpoints["search"], search_data)
+        search_results = await self._make_request("POST", self.ENDPOINTS["search"], search_data)
 
         if not search_results.get("found"):
-            return {"data": [], "total_count": 0, "total_pages": 1, "page": 1}
+            return _EMPTY_RESULT
 
         # 2. Obtener información detallada
         movie_data = {
@@ -99,15 +145,16 @@ class SubSourceAPI:
         if type == "tv" and season_number:
             movie_data["season"] = f"season-{season_number}"
 
-        movie_info = await self._make_request("POST", self.endpoints["get_movie"], movie_data)
+        movie_info = await self._make_request("POST", self.ENDPOINTS["get_movie"], movie_data)
 
         # 3. Convertir resultados
-        if "subs" not in movie_info:
-            return {"data": [], "total_count": 0, "total_pages": 1, "page": 1}
+        subs = movie_info.get("subs")
+        if not subs:
+            return _EMPTY_RESULT
 
         converted_subtitles = [
             self._convert_to_opensubtitles_format(sub)
-            for sub in movie_info["subs"]
+            for sub in subs
         ]
 
         return {
@@ -125,7 +172,10 @@ class SubSourceAPI:
         3. Descargar subtítulo
         """
         # Extraer información de la URL
-        *_, movie, lang, sub_id = url.split("/")
+        parts = urlsplit(url).path.rstrip("/").rsplit("/", 3)
+        if len(parts) < 3:
+            raise HTTPException(status_code=400, detail="URL de SubSource inválida")
+        movie, lang, sub_id = parts[-3], parts[-2], parts[-1]
         
         # Obtener token
         sub_data = {
@@ -134,11 +184,11 @@ class SubSourceAPI:
             "id": sub_id
         }
         
-        sub_info = await self._make_request("POST", self.endpoints["get_sub"], sub_data)
+        sub_info = await self._make_request("POST", self.ENDPOINTS["get_sub"], sub_data)
         download_token = sub_info["sub"]["downloadToken"]
         
         # Construir URL de descarga
-        download_url = f"{self.endpoints['download']}/{download_token}"
+        download_url = f"{self.ENDPOINTS['download']}/{download_token}"
         
         return {
             "link": download_url,
@@ -152,8 +202,8 @@ class SubSourceAPI:
 
     async def languages(self) -> Dict:
         """Obtiene la lista de idiomas soportados"""
-        return {"languages": list(self.language_map.values())}
+        return self.LANGUAGES
     
     async def formats(self) -> Dict:
         """Obtiene la lista de formatos soportados"""
-        return {"formats": ["srt"]}  # SubSource típicamente usa SRT
\ No newline at end of file
+        return self.FORMATS
\ No newline at end of file
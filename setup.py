@@ -7,11 +7,14 @@ setup(
     include_package_data=True,
     install_requires=[
         "fastapi",
-        "uvicorn",
+        "uvicorn[standard]",
         "aiohttp",
+        "aiodns",
         "pydantic",
         "python-dotenv",
         "pydantic-settings",
+        "fastapi-cache2[redis]",
+        "orjson",
     ],
     extras_require={
         "dev": [